@@ -1325,6 +1325,9 @@ class HDF5File
       \code compression = parameter; // 0 \< parameter \<= 9 
       \endcode
       where 0 stands for no compression and 9 for maximum compression.
+      When compression is active and <tt>shuffle</tt> is true (only in the overload
+      taking a chunkSize shape), the data are additionally byte-shuffled before
+      compression (HDF5's built-in shuffle filter, skipped if HDF5 was built without it).
 
       If the first character of datasetName is a "/", the path will be interpreted as absolute path,
       otherwise it will be interpreted as path relative to the current group.
@@ -1345,7 +1348,7 @@ class HDF5File
 
 
     template<unsigned int N, class T>
-    inline void createDataset(std::string datasetName, typename MultiArrayShape<N>::type shape, T init, typename MultiArrayShape<N>::type chunkSize, int compressionParameter = 0)
+    inline void createDataset(std::string datasetName, typename MultiArrayShape<N>::type shape, T init, typename MultiArrayShape<N>::type chunkSize, int compressionParameter = 0, bool shuffle = false)
     {
         // make datasetName clean
         datasetName = get_absolute_path(datasetName);
@@ -1389,6 +1392,11 @@ class HDF5File
         // enable compression
         if(compressionParameter > 0)
         {
+            // optionally byte-shuffle before deflate (makes multi-byte data compress
+            // better and faster), unless the filter was configured out of HDF5
+            if(shuffle && H5Zfilter_avail(H5Z_FILTER_SHUFFLE) > 0)
+                vigra_postcondition(H5Pset_shuffle(plist) >= 0,
+                    "HDF5File::createDataset(): unable to enable the shuffle filter.");
             H5Pset_deflate(plist, compressionParameter);
         }
 
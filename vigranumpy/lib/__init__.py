@@ -39,12 +39,16 @@ _vigra_path = os.path.abspath(os.path.dirname(__file__))
 _vigra_doc_path = _vigra_path + '/doc/vigranumpy/index.html'
 
 if sys.platform.startswith('win'):
-    # On Windows, add subdirectory 'dlls' to the PATH in order to find
-    # the DLLs vigranumpy depends upon. Since this directory appears
-    # at the end of PATH, already installed DLLs are always preferred.
+    # On Windows, register subdirectory 'dlls' with the DLL loader in order
+    # to find the DLLs vigranumpy depends upon. Python versions without
+    # os.add_dll_directory() fall back to appending the directory to
+    # the PATH, so that already installed DLLs are always preferred.
     _vigra_dll_path = _vigra_path + '/dlls'
     if os.path.exists(_vigra_dll_path):
-        os.putenv('PATH', os.getenv('PATH') + os.pathsep + _vigra_dll_path)
+        if hasattr(os, 'add_dll_directory'):
+            os.add_dll_directory(_vigra_dll_path)
+        else:
+            os.putenv('PATH', os.getenv('PATH') + os.pathsep + _vigra_dll_path)
 
 def _fallbackModule(moduleName, message):
     '''This function installs a fallback module with the given 'moduleName'.
@@ -58,13 +62,12 @@ def _fallbackModule(moduleName, message):
         def __init__(self, name):
             moduleClass.__init__(self, name)
             self.__name__ = name
+        # __getattr__() is only called when the regular lookup failed,
+        # so existing attributes are found without going through Python code
         def __getattr__(self, name):
             if name.startswith('__'):
-                return moduleClass.__getattribute__(self, name)
-            try:
-                return moduleClass.__getattribute__(self, name)
-            except AttributeError:
-                raise ImportError("""%s.%s: %s""" % (self.__name__, name, self.__doc__))
+                raise AttributeError(name)
+            raise ImportError("""%s.%s: %s""" % (self.__name__, name, self.__doc__))
 
     module = FallbackModule(moduleName)
     sys.modules[moduleName] = module
@@ -133,15 +136,20 @@ KeepContours = analysis.SRGType.KeepContours
 StopAtThreshold = analysis.SRGType.StopAtThreshold
  
 _selfdict = globals()
+_searchIndex = None
 def searchfor(searchstring):
    '''Scan all vigra modules to find classes and functions containing
       'searchstring' in their name.
    '''
-   for attr in _selfdict.keys():
-      contents = dir(_selfdict[attr])
-      for cont in contents:
-         if ( cont.upper().find(searchstring.upper()) ) >= 0:
-            print attr+"."+cont
+   global _searchIndex
+   if _searchIndex is None:
+      # build the (case-insensitive) index once, on first use
+      _searchIndex = [(attr + "." + cont, cont.lower()) 
+                      for attr in _selfdict.keys() for cont in dir(_selfdict[attr])]
+   searchstring = searchstring.lower()
+   for name, lowername in _searchIndex:
+      if searchstring in lowername:
+         print(name)
 
 def imshow(image):
     '''Display a scalar or RGB image by means of matplotlib.
@@ -153,10 +161,13 @@ def imshow(image):
     if image.ndim == 3:
         if image.shape[2] != 3:
             raise RuntimeError("vigra.imshow(): Multi channel image must have 3 channels.")
+        # swap first (this is just a view), so that the range mapping writes
+        # directly into a contiguous array in display order
+        image = image.swapaxes(0,1).view(numpy.ndarray)
         if image.dtype != uint8:
             image = colors.linearRangeMapping(image, newRange=(0.0, 255.0),\
-                                              out=image.__class__(image.shape, dtype=uint8))
-        return matplotlib.pyplot.imshow(image.swapaxes(0,1).view(numpy.ndarray))
+                                              out=numpy.empty(image.shape, dtype=uint8))
+        return matplotlib.pyplot.imshow(image)
     elif image.ndim == 2:
         return matplotlib.pyplot.imshow(image.swapaxes(0,1).view(numpy.ndarray), cmap=matplotlib.cm.gray, \
                                      norm=matplotlib.cm.colors.Normalize())
@@ -166,21 +177,25 @@ def imshow(image):
         
 # auto-generate code for additional Kernel generators:
 def _genKernelFactories(name):
-   for oldName in dir(eval('filters.'+name)):
+   KernelClass = getattr(filters, name)
+   
+   def makeFactory(newName, init):
+      def factory(*args):
+         k = KernelClass()
+         init(k, *args)
+         return k
+      factory.__name__ = newName
+      factory.__doc__ = init.__doc__
+      return factory
+      
+   for oldName in dir(KernelClass):
       if not oldName.startswith('init'):
         continue
       #remove init from beginning and start with lower case character
       newName = oldName[4].lower() + oldName[5:] + 'Kernel'
       if name == 'Kernel2D':
         newName += '2D'
-      code = '''def %(newName)s(*args):
-      k = filters.%(name)s()
-      k.%(oldName)s(*args)
-      return k
-%(newName)s.__doc__ = filters.%(name)s.%(oldName)s.__doc__
-filters.%(newName)s=%(newName)s
-''' % {'oldName': oldName, 'newName': newName, 'name': name}
-      exec code
+      setattr(filters, newName, makeFactory(newName, getattr(KernelClass, oldName)))
 
 _genKernelFactories('Kernel1D')
 _genKernelFactories('Kernel2D')
@@ -188,6 +203,10 @@ del _genKernelFactories
 
 # define watershedsUnionFind()
 def _genWatershedsUnionFind():
+    from functools import partial
+    watersheds8 = partial(analysis.watersheds, neighborhood=8, method='UnionFind')
+    watersheds6 = partial(analysis.watersheds, neighborhood=6, method='UnionFind')
+
     def watershedsUnionFind(image, neighborhood=None, out = None):
         '''Compute watersheds of an image using the union find algorithm.
            If 'neighborhood' is 'None', it defaults to 8-neighborhood for 2D inputs
@@ -197,7 +216,9 @@ def _genWatershedsUnionFind():
                 watersheds(image, neighborhood=neighborhood, method='UnionFind', out=out)
         '''
         if neighborhood is None:
-            neighborhood = 8 if image.spatialDimensions == 2 else 6
+            if image.spatialDimensions == 2:
+                return watersheds8(image, out=out)
+            return watersheds6(image, out=out)
                 
         return analysis.watersheds(image, neighborhood=neighborhood, method='UnionFind', out=out)
     
@@ -71,14 +71,43 @@ from numpy import float32, float64, longdouble, complex64, complex128, clongdoub
 
 from vigranumpycore import AxisType, AxisInfo, AxisTags
 
-try:
-    import qimage2ndarray
-except:
-    import vigra
-    vigra._fallbackModule('qimage2ndarray',
-    '''    It can be obtained at
-    http://pypi.python.org/pypi/qimage2ndarray/.''')
-    import qimage2ndarray
+def _importQimage2ndarray():
+    # qimage2ndarray pulls in PyQt, so it is only imported on first use
+    # (if it is missing, a fallback module is installed that explains why)
+    try:
+        import qimage2ndarray
+    except:
+        import vigra
+        vigra._fallbackModule('qimage2ndarray',
+        '''    It can be obtained at
+        http://pypi.python.org/pypi/qimage2ndarray/.''')
+        import qimage2ndarray
+    return qimage2ndarray
+
+# the following modules import arraytypes themselves and can therefore not be
+# imported at the top of this file -- they are imported once, on first use
+_filters, _sampling, _impex = None, None, None
+
+def _filtersModule():
+    global _filters
+    if _filters is None:
+        import filters
+        _filters = filters
+    return _filters
+
+def _samplingModule():
+    global _sampling
+    if _sampling is None:
+        import sampling
+        _sampling = sampling
+    return _sampling
+
+def _impexModule():
+    global _impex
+    if _impex is None:
+        import vigra.impex
+        _impex = vigra.impex
+    return _impex
 
 def qimage2array(q):
     '''Create a view to the given array with the appropriate type.
@@ -89,15 +118,26 @@ def qimage2array(q):
        a Vector4Image will be ordered as [alpha, red, green, blue].
     '''
     import PyQt4.QtGui as qt
-    import qimage2ndarray
-    if q.format() == qt.QImage.Format_Indexed8:
-        width, height = q.width(), q.height()
-        return qimage2ndarray.byte_view(q).swapaxes(0,1).reshape((width, height)).view(ScalarImage)
-    if q.format() == qt.QImage.Format_RGB32:
-        return qimage2ndarray.rgb_view(q).swapaxes(0,1).view(RGBImage)
-    if q.format() == qt.QImage.Format_ARGB32:
-        return qimage2ndarray.byte_view(q, 'big').swapaxes(0,1).view(Vector4Image)
-    raise RuntimeError("qimage2array(): q.format() must be Format_Indexed8, Format_RGB32, or Format_ARGB32")
+    qimage2ndarray = _importQimage2ndarray()
+    qformat = q.format()
+    if qformat == qt.QImage.Format_Indexed8:
+        # byte_view() has shape (height, width, 1) => drop the singleton channel axis
+        b, cls = qimage2ndarray.byte_view(q), ScalarImage
+        shape = (q.width(), q.height())
+    elif qformat == qt.QImage.Format_RGB32:
+        b, cls = qimage2ndarray.rgb_view(q), RGBImage
+        shape = (q.width(), q.height(), 3)
+    elif qformat == qt.QImage.Format_ARGB32:
+        b, cls = qimage2ndarray.byte_view(q, 'big'), Vector4Image
+        shape = (q.width(), q.height(), 4)
+    else:
+        raise RuntimeError("qimage2array(): q.format() must be Format_Indexed8, Format_RGB32, or Format_ARGB32")
+    # swap x and y by direct manipulation of the strides, and attach the
+    # axistags right away (the view itself cannot infer them)
+    strides = (b.strides[1], b.strides[0]) + b.strides[2:len(shape)]
+    res = numpy.lib.stride_tricks.as_strided(b, shape=shape, strides=strides).view(cls)
+    res.axistags = AxisTags(_defaultAxistagsPrototype('V', 2, len(shape) > 2))
+    return res
     
 class classproperty(object):
     def __get__(self, instance, cls):
@@ -144,10 +184,11 @@ def _array_docstring_(name, shape, compat):
     return '''
     Constructor:
     
-    .. method:: %(name)s(obj, dtype=numpy.float32, order='V', init = True, value = None)
+    .. method:: %(name)s(obj, dtype=None, order='V', init = True, value = None)
 
         :param obj: a data or shape object (see below)
-        :param dtype: desired element type
+        :param dtype: desired element type (None means the class attribute
+                      'defaultDtype', which is numpy.float32 unless changed)
         :param order: desired memory layout (see below)
         :param init: True: initialize the image with zeros; False: do not initialize the image
         :type init: boolean
@@ -202,10 +243,40 @@ def _array_docstring_(name, shape, compat):
 %(compat)s
     ''' % {'name': name, 'shape': shape, 'compat': compat}
 
+def _strideArgsort(strides):
+    '''Return the indices that sort the given (short) sequence of strides.
+       Same as list(numpy.array(strides).argsort()), but much cheaper.'''
+    return sorted(range(len(strides)), key=strides.__getitem__)
+
+def _inversePermutation(permutation):
+    inverse = [0]*len(permutation)
+    for k, p in enumerate(permutation):
+        inverse[p] = k
+    return inverse
+
+# cache for the axes of the 'C', 'F', and 'V' memory layouts in order of
+# increasing stride, indexed by (order, ndim)
+_standardStrideOrderings = {}
+
+def _standardStrideOrdering(order, ndim):
+    key = (order, ndim)
+    try:
+        return _standardStrideOrderings[key]
+    except KeyError:
+        if order == "C":
+            axes = tuple(range(ndim-1, -1, -1))
+        elif order == "F":
+            axes = tuple(range(ndim))
+        else: # order == "V"
+            axes = (ndim-1,) + tuple(range(ndim-1))
+        _standardStrideOrderings[key] = axes
+        return axes
+
 def constructNumpyArray(cls, obj, spatialDimensions, channels, dtype, order, init):
     if isinstance(obj, numpy.ndarray):
         shape = list(obj.shape)
-        strideOrdering = list(numpy.array(obj.strides).argsort().argsort())
+        # rank of each axis in order of increasing stride
+        strideOrdering = _inversePermutation(_strideArgsort(obj.strides))
     else:
         shape = list(obj)
         strideOrdering = None
@@ -246,20 +317,16 @@ def constructNumpyArray(cls, obj, spatialDimensions, channels, dtype, order, ini
 
     # create the appropriate strideOrdering objects for the other memory orders
     # (when strideOrdering already contained data, it is ignored because order != "A")
-    if order == "C":
-        strideOrdering = range(len(pshape)-1, -1, -1)
-    elif order == "F" or (order == "V" and channels == 1):
-        strideOrdering = range(len(pshape))
-    elif order == "V":
-        strideOrdering = range(1, len(pshape)+1)
-        strideOrdering[-1] = 0
-        
-    ppshape = [0]*len(pshape)
-    for k in xrange(len(pshape)):
-        ppshape[strideOrdering[k]] = pshape[k]
+    if order in ("C", "F", "V"):
+        if order == "V" and channels == 1:
+            order = "F"
+        axes = _standardStrideOrdering(order, len(pshape))
+    else:
+        axes = _inversePermutation(strideOrdering)
     
-    res = numpy.ndarray.__new__(cls, ppshape, dtype, order='F')
-    res = res.transpose(strideOrdering)
+    # allocate the array directly with the desired strides
+    strides, nbytes = _denseStrides(axes, pshape, numpy.dtype(dtype).itemsize)
+    res = numpy.ndarray.__new__(cls, pshape, dtype, strides=strides)
 
     if init:
         if isinstance(obj, numpy.ndarray):
@@ -267,7 +334,66 @@ def constructNumpyArray(cls, obj, spatialDimensions, channels, dtype, order, ini
         else:
             res[...] = 0
     return res
-        
+
+def _denseStrides(axes, shape, itemsize):
+    '''Strides of a dense array of the given 'shape' whose 'axes' are listed in
+       order of increasing stride. Also returns the array's size in bytes.'''
+    strides = [0]*len(shape)
+    stride = itemsize
+    for k in axes:
+        strides[k] = stride
+        stride *= max(shape[k], 1)
+    return strides, stride
+
+def _emptyArrayLike(array):
+    '''Allocate an uninitialized array of the same class, shape, dtype and memory
+       layout as the given VigraArray 'array', with a copy of its axistags.
+       This bypasses the general constructor and is therefore much cheaper.'''
+    strides, nbytes = _denseStrides(_strideArgsort(array.strides), array.shape, array.itemsize)
+    res = numpy.ndarray.__new__(array.__class__, array.shape, array.dtype, strides=strides)
+    res.axistags = AxisTags(array.axistags)
+    return res
+
+def _zeroArraysLike(array, shapes):
+    '''Allocate zero-initialized arrays of the given 'shapes' with the same class,
+       dtype, memory layout and axistags as the given VigraArray 'array'.
+       All arrays are views into a single memory block.'''
+    axes, itemsize = _strideArgsort(array.strides), array.itemsize
+    layouts = [_denseStrides(axes, shape, itemsize) for shape in shapes]
+    arena = numpy.zeros(sum([nbytes for strides, nbytes in layouts]), dtype=numpy.uint8)
+    res, offset = [], 0
+    for shape, (strides, nbytes) in zip(shapes, layouts):
+        a = numpy.ndarray.__new__(array.__class__, shape, array.dtype,
+                                  buffer=arena, offset=offset, strides=strides)
+        a.axistags = AxisTags(array.axistags)
+        res.append(a)
+        offset += nbytes
+    return res
+
+# prototypes of the default axistags, indexed by (order, spatialDimensions, hasChannelAxis)
+# (they must not be modified -- copy them via AxisTags(prototype) instead)
+_defaultAxistags = {}
+
+def _defaultAxistagsPrototype(order, spatialDimensions, hasChannelAxis):
+    key = (order, spatialDimensions, hasChannelAxis)
+    try:
+        return _defaultAxistags[key]
+    except KeyError:
+        if order == 'C':
+            axistags = [AxisInfo.z, AxisInfo.y, AxisInfo.x][-spatialDimensions:]
+        else:
+            axistags = [AxisInfo.x, AxisInfo.y, AxisInfo.z][:spatialDimensions]
+        if hasChannelAxis:
+            axistags.append(AxisInfo.c)
+        res = _defaultAxistags[key] = AxisTags(axistags)
+        return res
+
+def _dropAxistag(array, axis):
+    # 'array' shares its axistags with the array it was derived from
+    # (see _VigraArray.__array_finalize__()), so modify a copy
+    axistags = AxisTags(array.axistags)
+    del axistags[axis]
+    array.axistags = axistags
 
 ##################################################################
 
@@ -278,10 +404,15 @@ compatible with the memory layout requirements of
 VIGRA's NumpyArray family of C++ views. Do always use
 this class via its subclasses!
     """
-    def __new__(cls, obj, dtype=numpy.float32, order='V', init = True, value = None, axistags = None):
+    # the element type of new arrays when no explicit 'dtype' is given
+    defaultDtype = numpy.float32
+    
+    def __new__(cls, obj, dtype=None, order='V', init = True, value = None, axistags = None):
         # FIXME: we can get axistags in 3 different ways: from 'obj', implicitly from 'order',
         #        and explicitly from 'axistags'
         #        this is not yet consistent
+        if dtype is None:
+            dtype = cls.defaultDtype
         if isinstance(obj, numpy.ndarray) and not isinstance(obj, _VigraArray):
             obj = obj.swapaxes(0, cls.spatialDimensions-1)
         # FIXME: constructNumpyArray() must be replaced by ndarray.__new__ in order
@@ -297,15 +428,14 @@ this class via its subclasses!
                 order = 'V'
             if hasattr(obj, 'axistags'):
                 axistags = obj.axistags
-            elif order == 'V' or order == 'F':
-                axistags = [AxisInfo.x, AxisInfo.y, AxisInfo.z][:cls.spatialDimensions]
-            elif order == 'C':
-                axistags = [AxisInfo.z, AxisInfo.y, AxisInfo.x][-cls.spatialDimensions:]
+            elif order == 'V' or order == 'F' or order == 'C':
+                # copied below
+                axistags = _defaultAxistagsPrototype(order, cls.spatialDimensions,
+                                                     res.ndim > cls.spatialDimensions)
             elif order == 'A':
-                strideOrder = [int(k) for k in numpy.array(res.strides).argsort()]
+                strideOrder = _strideArgsort(res.strides)
                 strideOrder.reverse()
-                strideOrder = strideOrder[:cls.spatialDimensions]
-                strideOrder = [int(k) for k in numpy.array(strideOrder).argsort()]
+                strideOrder = _strideArgsort(strideOrder[:cls.spatialDimensions])
                 axistags = [AxisInfo.z, AxisInfo.y, AxisInfo.x][-cls.spatialDimensions:]
                 axistags = [axistags[k] for k in strideOrder]
             if res.ndim > len(axistags):
@@ -325,8 +455,13 @@ this class via its subclasses!
             return 'C'
         elif self.flags.f_contiguous:
             return 'F'
-        elif self.channels > 1 and self.itemsize == self.strides[-1] and \
-             reduce(lambda x, y: y if y >= x and x >= 0 else -1, self.strides[:-1], 0) >= 0:
+        elif self.bands() > 1 and self.itemsize == self.strides[-1]:
+            # 'V' order requires the spatial strides to be increasing
+            previous = 0
+            for stride in self.strides[:-1]:
+                if stride < previous:
+                    return 'A'
+                previous = stride
             return 'V'
         return 'A'
     
@@ -359,6 +494,9 @@ this class via its subclasses!
         else:
             return self.shape[-1]
 
+    # number of channels: the class reports the number of channels it requires
+    # (0 for the generic classes which allow any number), an instance reports
+    # its actual number of bands (e.g. 1 for a channel slice of an RGBImage)
     channels = classproperty(lambda cls: 0, bands)
     
     @property
@@ -432,9 +570,6 @@ this class via its subclasses!
     def __radd__(self, other):
         return ufunc.add(other, self)
     
-    def __radd__(self, other):
-        return ufunc.add(other, self)
-    
     def __rand__(self, other):
         return ufunc.bitwise_and(other, self)
     
@@ -448,7 +583,7 @@ this class via its subclasses!
         return ufunc.floor_divide(other, self)
     
     def __rlshift__(self, other):
-        return ufunc.left_shoft(other, self)
+        return ufunc.left_shift(other, self)
     
     def __rmod__(self, other):
         return ufunc.remainder(other, self)
@@ -489,29 +624,25 @@ this class via its subclasses!
     def all(self, axis=None, out=None):
         res = numpy.ndarray.all(self, axis, out)
         if axis is not None:
-            res.axistags = AxisTags(res.axistags)
-            del res.axistags[axis]
+            _dropAxistag(res, axis)
         return res
 
     def any(self, axis=None, out=None):
         res = numpy.ndarray.any(self, axis, out)
         if axis is not None:
-            res.axistags = AxisTags(res.axistags)
-            del res.axistags[axis]
+            _dropAxistag(res, axis)
         return res
 
     def argmax(self, axis=None, out=None):
         res = numpy.ndarray.argmax(self, axis, out)
         if axis is not None:
-            res.axistags = AxisTags(res.axistags)
-            del res.axistags[axis]
+            _dropAxistag(res, axis)
         return res
         
     def argmin(self, axis=None, out=None):
         res = numpy.ndarray.argmin(self, axis, out)
         if axis is not None:
-            res.axistags = AxisTags(res.axistags)
-            del res.axistags[axis]
+            _dropAxistag(res, axis)
         return res
     
     def cumsum(self, axis=None, dtype=None, out=None):
@@ -528,29 +659,28 @@ this class via its subclasses!
 
     # FIXME: this should depend on axistags
     def flatten(self, order='C'):
-        res = numpy.ndarray.flatten(self.swapaxes(0, self.spatialDimensions-1), order)
+        # use the plain ndarray method, because our swapaxes()
+        # would copy the axistags only to discard them below
+        res = numpy.ndarray.flatten(numpy.ndarray.swapaxes(self, 0, self.spatialDimensions-1), order)
         res.axistags = AxisTags(1)
         return res        
 
     def max(self, axis=None, out=None):
         res = numpy.ndarray.max(self, axis, out)
         if axis is not None:
-            res.axistags = AxisTags(res.axistags)
-            del res.axistags[axis]
+            _dropAxistag(res, axis)
         return res
 
     def mean(self, axis=None, out=None):
         res = numpy.ndarray.mean(self, axis, out)
         if axis is not None:
-            res.axistags = AxisTags(res.axistags)
-            del res.axistags[axis]
+            _dropAxistag(res, axis)
         return res
     
     def min(self, axis=None, out=None):
         res = numpy.ndarray.min(self, axis, out)
         if axis is not None:
-            res.axistags = AxisTags(res.axistags)
-            del res.axistags[axis]
+            _dropAxistag(res, axis)
         return res
     
     def nonzero(self):
@@ -562,15 +692,13 @@ this class via its subclasses!
     def prod(self, axis=None, dtype=None, out=None):
         res = numpy.ndarray.prod(self, axis, dtype, out)
         if axis is not None:
-            res.axistags = AxisTags(res.axistags)
-            del res.axistags[axis]
+            _dropAxistag(res, axis)
         return res
 
     def ptp(self, axis=None, out=None):
         res = numpy.ndarray.ptp(self, axis, out)
         if axis is not None:
-            res.axistags = AxisTags(res.axistags)
-            del res.axistags[axis]
+            _dropAxistag(res, axis)
         return res
 
     # FIXME: this should depend on axistags
@@ -590,25 +718,33 @@ this class via its subclasses!
         res.axistags = AxisTags(res.ndim)
         return res        
 
-    def resize(self, new_shape, refcheck=True, order=False):
-        res = numpy.ndarray.reshape(self, new_shape, refcheck, order)
-        res.axistags = AxisTags(res.ndim)
-        return res        
+    def resize(self, new_shape, refcheck=False):
+        '''Change shape and size of the array in-place, see numpy.ndarray.resize.
+           The resulting array gets default axistags.
+           
+           Unlike numpy, 'refcheck' defaults to False: since this call goes through
+           a Python method, the array is always referenced more than once, so
+           numpy's reference check would always fail. The caller must therefore
+           make sure that no other array refers to this array's memory, because
+           it may be reallocated.
+        '''
+        numpy.ndarray.resize(self, new_shape, refcheck=refcheck)
+        self.axistags = AxisTags(self.ndim)
             
     def squeeze(self):
         res = numpy.ndarray.squeeze(self)
         if self.ndim != res.ndim:
-            res.axistags = AxisTags(res.axistags)
+            axistags = AxisTags(res.axistags)
             for k in xrange(self.ndim-1, -1, -1):
                 if self.shape[k] == 1:
-                    del res.axistags[k]
+                    del axistags[k]
+            res.axistags = axistags
         return res        
 
     def std(self, axis=None, dtype=None, out=None, ddof=0):
         res = numpy.ndarray.std(self, axis, dtype, out, ddof)
         if axis is not None:
-            res.axistags = AxisTags(res.axistags)
-            del res.axistags[axis]
+            _dropAxistag(res, axis)
         if len(res.shape) == 0:
             res = res.item()
         return res
@@ -616,8 +752,7 @@ this class via its subclasses!
     def sum(self, axis=None, dtype=None, out=None):
         res = numpy.ndarray.sum(self, axis, dtype, out)
         if axis is not None:
-            res.axistags = AxisTags(res.axistags)
-            del res.axistags[axis]
+            _dropAxistag(res, axis)
         return res
             
     def swapaxes(self, i, j):
@@ -650,8 +785,7 @@ this class via its subclasses!
     def var(self, axis=None, dtype=None, out=None, ddof=0):
         res = numpy.ndarray.var(self, axis, dtype, out, ddof)
         if axis is not None:
-            res.axistags = AxisTags(res.axistags)
-            del res.axistags[axis]
+            _dropAxistag(res, axis)
         if len(res.shape) == 0:
             res = res.item()
         return res
@@ -659,7 +793,7 @@ this class via its subclasses!
     def transposeToOrder(self, order = 'C'):
         if order == 'A':
             return self
-        permutation = [int(k) for k in numpy.array(self.strides).argsort()]
+        permutation = _strideArgsort(self.strides)
         if order == 'C':
             permutation.reverse()
         elif order == 'V':
@@ -693,22 +827,44 @@ this class via its subclasses!
              * getitem creates a copy of an array (fancy indexing) => all axistags are 'None'
         '''
         res = numpy.ndarray.__getitem__(self, index)
-        if res is not self and hasattr(res, 'axistags'):
-            if(res.base is self):
-                res.axistags = res.axistags.transform(index, res.ndim)
-            else:
-                res.axistags = AxisTags(res.ndim)
+        # check the cheap type test first: element access returns a scalar
+        if not isinstance(res, _VigraArray) or res is self or not hasattr(res, 'axistags'):
+            return res
+        if res.base is self:
+            res.axistags = res.axistags.transform(index, res.ndim)
+        else:
+            res.axistags = AxisTags(res.ndim)
         return res
 
     for k in ['all', 'any', 'argmax', 'argmin', 'cumsum', 'cumprod', 'flatten', 
                'max', 'mean', 'min', 'nonzero', 'prod', 'ptp', 'ravel', 'repeat', 
-               'reshape', 'resize', 'squeeze', 'std', 'sum', 'swapaxes', 'take', 
+               'reshape', 'squeeze', 'std', 'sum', 'swapaxes', 'take', 
                'transpose', 'var']:
-        exec k + '.__doc__ = numpy.ndarray.' + k + '.__doc__'
+        locals()[k].__doc__ = getattr(numpy.ndarray, k).__doc__
+    del k
 
 
 ##################################################################
 
+# luminance weights of the red, green, and blue channels
+_luminanceWeights = {'Rec601': (0.299, 0.587, 0.114),
+                     'Rec709': (0.2126, 0.7152, 0.0722)}
+
+def _rgbToGray(rgb, scalarClass, weights):
+    if isinstance(weights, basestring):
+        # unknown names fail the length check below
+        weights = _luminanceWeights.get(weights, ())
+    if len(weights) != 3:
+        raise ValueError("toGray(): weights must be 'Rec601', 'Rec709', or a sequence of 3 numbers.")
+    sd = rgb.spatialDimensions
+    dtype = rgb.dtype if rgb.dtype.kind == 'f' else scalarClass.defaultDtype
+    # contract the channel axis in numpy order (which is contiguous for the
+    # default 'V' layout), the transposed result then has 'V' order as well
+    a = rgb.view(numpy.ndarray).transpose(range(sd-1, -1, -1) + [sd])
+    res = numpy.dot(a, numpy.array(weights, dtype=dtype)).transpose().view(scalarClass)
+    res.axistags = AxisTags(_defaultAxistagsPrototype('V', sd, False))
+    return res
+
 class Image(_VigraArray):
     __doc__ = _array_docstring_('Image', '''A shape is compatible when it has two dimensions (width, height) or three dimensions (width, height, channels).''', """
           'C':
@@ -740,13 +896,11 @@ class Image(_VigraArray):
             
     def write(self, filename, dtype = '', compression = ''):
         "Write an image to a file. Consult :func:`vigra.impex.writeImage` for detailed documentation"
-        import vigra.impex
-        vigra.impex.writeImage(self, filename, dtype, compression)
+        _impexModule().writeImage(self, filename, dtype, compression)
             
-    def writeHDF5(self, filename, pathInFile, dtype = ''):
+    def writeHDF5(self, filename, pathInFile, dtype = '', chunks = True, compression = 0):
         "Write an image to a HDF5 file. Consult :func:`vigra.impex.writeImageToHDF5` for detailed documentation"
-        import vigra.impex
-        vigra.impex.writeImageToHDF5(self, filename, pathInFile, dtype)
+        _impexModule().writeImageToHDF5(self, filename, pathInFile, dtype, chunks, compression)
 
     def show(self, normalize = True):
         '''
@@ -797,11 +951,11 @@ class Image(_VigraArray):
           don't scale the image's values
            
         """
-        import qimage2ndarray
+        qimage2ndarray = _importQimage2ndarray()
 
         yxImage = self.swapaxes(0, 1)
 
-        if self.channels == 1:
+        if self.bands() == 1:
             q = qimage2ndarray.gray2qimage(yxImage, normalize)
         else:
             q = qimage2ndarray.array2qimage(yxImage, normalize)
@@ -818,10 +972,18 @@ class Image(_VigraArray):
         "the image's height"
         return self.shape[1]
 
-    @classproperty
-    def spatialDimensions(cls):
-        "number of spatial dimensions (useful for distinguishing RGBImage and ScalarVolume)"
-        return 2
+    def splitChannels(self):
+        '''Return the channels of the image as a list of ScalarImages.
+           Each channel is copied into a separate contiguous array, which is
+           much faster to process than the interleaved channels when the
+           subsequent computations operate on one channel at a time.
+        '''
+        if self.ndim == self.spatialDimensions:
+            return [ScalarImage(self, dtype=self.dtype)]
+        return [ScalarImage(self[..., k], dtype=self.dtype) for k in range(self.shape[-1])]
+
+    # number of spatial dimensions (useful for distinguishing RGBImage and ScalarVolume)
+    spatialDimensions = 2
 
 class ScalarImage(Image):
     __doc__ = _array_docstring_('ScalarImage', '''A shape is compatible when it has two dimensions (width, height) or three dimensions (width, height, 1).''', """
@@ -922,6 +1084,14 @@ class RGBImage(Vector3Image):
              | NumpyArray<2, TinyVector<T, 3>, UnstridedArrayTag>,
              | NumpyArray<3, Multiband<T>, StridedArrayTag>""")
 
+    def toGray(self, weights = 'Rec601'):
+        '''Convert the image into a ScalarImage holding the luminance.
+           'weights' are the factors of the red, green, and blue channels, either
+           'Rec601' (default, 0.299, 0.587, 0.114), 'Rec709' (0.2126, 0.7152, 0.0722),
+           or a sequence of 3 numbers. Integer images are converted to float32.
+        '''
+        return _rgbToGray(self, ScalarImage, weights)
+
 #################################################################
 
 class Volume(_VigraArray):
@@ -952,16 +1122,13 @@ class Volume(_VigraArray):
             
     def write(self, filename_base, filename_ext, dtype = '', compression = ''):
         "Write a volume to a sequence of files. Consult :func:`vigra.impex.writeVolume` for detailed documentation.\n"
-        import vigra.impex
-        vigra.impex.writeVolume(self, filename_base, filename_ext, dtype, compression)
+        _impexModule().writeVolume(self, filename_base, filename_ext, dtype, compression)
             
-    def writeHDF5(self, filename, pathInFile, dtype = ''):
+    def writeHDF5(self, filename, pathInFile, dtype = '', chunks = True, compression = 0):
         "Write a volume to a HDF5 file. Consult :func:`vigra.impex.writeVolumeToHDF5` for detailed documentation.\n"
-        import vigra.impex
-        vigra.impex.writeVolumeToHDF5(self, filename, pathInFile, dtype)
+        _impexModule().writeVolumeToHDF5(self, filename, pathInFile, dtype, chunks, compression)
     
-    @classproperty
-    def spatialDimensions(cls): return 3
+    spatialDimensions = 3
         
     @property
     def width(self):
@@ -975,6 +1142,15 @@ class Volume(_VigraArray):
     def depth(self):
         return self.shape[2]
 
+    def splitChannels(self):
+        '''Return the channels of the volume as a list of ScalarVolumes.
+           Each channel is copied into a separate contiguous array, see
+           :meth:`Image.splitChannels`.
+        '''
+        if self.ndim == self.spatialDimensions:
+            return [ScalarVolume(self, dtype=self.dtype)]
+        return [ScalarVolume(self[..., k], dtype=self.dtype) for k in range(self.shape[-1])]
+
 class ScalarVolume(Volume):
     __doc__ = _array_docstring_('ScalarVolume', '''
     A shape is compatible when it has three dimensions (width, height,
@@ -1084,10 +1260,35 @@ class RGBVolume(Vector3Volume):
              | NumpyArray<3, TinyVector<T, 3>, UnstridedArrayTag>,
              | NumpyArray<4, Multiband<T>, StridedArrayTag>""")
 
+    def toGray(self, weights = 'Rec601'):
+        '''Convert the volume into a ScalarVolume holding the luminance,
+           see :meth:`RGBImage.toGray`.
+        '''
+        return _rgbToGray(self, ScalarVolume, weights)
+
 
 #################################################################
 
+# the two expansion kernels of the Burt filter (for even and odd output
+# positions), indexed by centerValue; only the first few centerValues are
+# cached, so that arbitrary user-supplied values cannot grow it without bound
+_burtExpandKernelCache = {}
+_burtExpandKernelCacheSize = 8
+
+def _burtExpandKernels(centerValue):
+    try:
+        return _burtExpandKernelCache[centerValue]
+    except KeyError:
+        filters = _filtersModule()
+        kernels = (filters.explicitlyKernel(-1, 1, numpy.array([0.5 - centerValue, 2.0*centerValue, 0.5 - centerValue])),
+                   filters.explicitlyKernel(-1, 0, numpy.array([0.5, 0.5])))
+        if len(_burtExpandKernelCache) < _burtExpandKernelCacheSize:
+            _burtExpandKernelCache[centerValue] = kernels
+        return kernels
+
 class ImagePyramid(list):
+    __slots__ = ('_lowestLevel', '_highestLevel')
+    
     def __init__(self, image, copyImagedestLevel = 0, lowestLevel = 0, highestLevel = 0):
         ''' Create a new pyramid.
             The new pyramid levels range from 'lowestLevel' to 'highestLevel' (inclusive),
@@ -1098,7 +1299,9 @@ class ImagePyramid(list):
         if lowestLevel > copyImagedestLevel or highestLevel < copyImagedestLevel:
             raise ValueError('ImagePyramid(): copyImagedestLevel must be between lowestLevel and highestLevel (inclusive)')
         
-        list.__init__(self, [image.__class__(image, dtype=image.dtype)])
+        level0 = _emptyArrayLike(image)
+        numpy.ndarray.__setitem__(level0, Ellipsis, image)
+        list.__init__(self, [level0])
         self._lowestLevel = copyImagedestLevel
         self._highestLevel = copyImagedestLevel
         self.createLevel(lowestLevel)
@@ -1120,50 +1323,78 @@ class ImagePyramid(list):
         '''Get the image at 'level'.
            Raises IndexError when the level does not exist.
         '''
-        if level < self.lowestLevel or level > self.highestLevel:
+        if level < self._lowestLevel or level > self._highestLevel:
             raise IndexError("ImagePyramid[level]: level out of range.")
-        return list.__getitem__(self, level - self.lowestLevel)
+        return list.__getitem__(self, level - self._lowestLevel)
     
     def __setitem__(self, level, image):
         '''Copy the data of the given 'image' to the image at 'level'.
            Raises IndexError when the level does not exist.
         '''
-        self[level][...] = image[...]
+        # plain ndarray assignment, 'image' needs no view (and no axistags)
+        numpy.ndarray.__setitem__(self[level], Ellipsis, image)
         
     def expandImpl(self, src, dest, centerValue):
-        import filters
+        '''Expand 'src' into 'dest' (which must be about twice as large).
+           float32 images are processed by the C++ function
+           :func:`vigra.sampling.pyramidExpandBurtFilter`, other images by
+           a slower sequence of :func:`vigra.filters.convolve` calls. Both
+           agree in the interior, but may differ slightly within two pixels
+           of the image border due to different border treatment.
+        '''
+        if src.dtype == numpy.float32 and dest.dtype == numpy.float32 and \
+           src.spatialDimensions == 2 and 0.25 <= centerValue <= 0.5:
+            # single pass over 'src' in C++, see pyramidExpandBurtFilter_
+            _samplingModule().pyramidExpandBurtFilter(src, centerValue, out=dest)
+            return
+        
+        filters = _filtersModule()
         
         ss, ds = src.shape, dest.shape
         s = [ss[k] if 2*ss[k] == ds[k] else -1 for k in range(len(ss))]
     
-        smooth1 = filters.explicitlyKernel(-1, 1, numpy.array([0.5 - centerValue, 2.0*centerValue, 0.5 - centerValue]))
-        smooth2 = filters.explicitlyKernel(-1, 0, numpy.array([0.5, 0.5]));
+        smooth1, smooth2 = _burtExpandKernels(centerValue)
 
         filters.convolve(src, (smooth1, smooth1), out=dest[::2,::2])
         filters.convolve(src[:,:s[1]], (smooth1, smooth2), out=dest[::2,1::2])
         filters.convolve(src[:s[0],:], (smooth2, smooth1), out=dest[1::2,::2])
         filters.convolve(src[:s[0],:s[1]], (smooth2, smooth2), out=dest[1::2,1::2])
     
+    def reduceImpl(self, src, dest, centerValue):
+        '''Reduce 'src' into 'dest' (which must be about half as large).
+           float32 images are processed by the C++ function
+           :func:`vigra.sampling.pyramidReduceBurtFilter`, other images by
+           smoothing with :func:`vigra.filters.convolve` and subsampling
+           (results may differ slightly near the image border).
+        '''
+        if src.dtype == numpy.float32 and dest.dtype == numpy.float32 and \
+           src.spatialDimensions == 2 and 0.25 <= centerValue <= 0.5:
+            # computes only the retained samples, see pyramidReduceBurtFilter_
+            _samplingModule().pyramidReduceBurtFilter(src, centerValue, out=dest)
+            return
+        
+        filters = _filtersModule()
+        
+        smooth = filters.burtFilterKernel(0.25 - 0.5*centerValue)
+        dest[...] = filters.convolve(src, smooth)[::2,::2]
+    
     def reduce(self, srcLevel, destLevel, centerValue = 0.42):
         '''Reduce the image at 'srcLevel' to 'destLevel', using the Burt smoothing filter
            with the given 'centerValue'. srcLevel must be smaller than destLevel.
            
            For more details, see pyramidReduceBurtFilter_ in the C++ documentation.
         '''
-        # FIXME: This should be implemented in C++
         # FIXME: This should be implemented for arbitrary dimensions
-        import filters
-        
         if srcLevel > destLevel:
             raise RuntimeError("ImagePyramid::reduce(): srcLevel <= destLevel required.")
         if srcLevel < self.lowestLevel or srcLevel > self.highestLevel:
             raise RuntimeError("ImagePyramid::reduce(): srcLevel does not exist.")
         self.createLevel(destLevel)
         
-        smooth = filters.burtFilterKernel(0.25 - 0.5*centerValue)
-        for k in range(srcLevel, destLevel):
-            i = filters.convolve(self[k], smooth)
-            self[k+1] = i[::2,::2]
+        # the levels have been checked above, so access the list directly
+        lo = self._lowestLevel
+        for k in range(srcLevel - lo, destLevel - lo):
+            self.reduceImpl(list.__getitem__(self, k), list.__getitem__(self, k+1), centerValue)
 
     def expand(self, srcLevel, destLevel, centerValue = 0.42):
         '''Expand the image at 'srcLevel' to 'destLevel', using the Burt smoothing filter
@@ -1171,7 +1402,6 @@ class ImagePyramid(list):
            
            For more details, see pyramidExpandBurtFilter_ in the C++ documentation.
         '''
-        # FIXME: This should be implemented in C++
         # FIXME: This should be implemented for arbitrary dimensions
         if srcLevel < destLevel:
             raise RuntimeError("ImagePyramid::expand(): srcLevel >= destLevel required.")
@@ -1179,8 +1409,9 @@ class ImagePyramid(list):
             raise RuntimeError("ImagePyramid::expand(): srcLevel does not exist.")
         self.createLevel(destLevel)
 
-        for k in range(srcLevel, destLevel, -1):
-            self.expandImpl(self[k], self[k-1], centerValue)
+        lo = self._lowestLevel
+        for k in range(srcLevel - lo, destLevel - lo, -1):
+            self.expandImpl(list.__getitem__(self, k), list.__getitem__(self, k-1), centerValue)
 
     def reduceLaplacian(self, srcLevel, destLevel, centerValue = 0.42):
         '''Reduce the image at 'srcLevel' to 'destLevel', using the Burt smoothing filter
@@ -1189,22 +1420,23 @@ class ImagePyramid(list):
            
            For more details, see pyramidReduceBurtLaplacian_ in the C++ documentation.
         '''
-        # FIXME: This should be implemented in C++
         # FIXME: This should be implemented for arbitrary dimensions
-        import filters
-        
         if srcLevel > destLevel:
             raise RuntimeError("ImagePyramid::reduceLaplacian(): srcLevel <= destLevel required.")
         if srcLevel < self.lowestLevel or srcLevel > self.highestLevel:
             raise RuntimeError("ImagePyramid::reduceLaplacian(): srcLevel does not exist.")
         self.createLevel(destLevel)
 
-        smooth = filters.burtFilterKernel(0.25 - 0.5*centerValue)
-        for k in range(srcLevel, destLevel):
-            i = filters.convolve(self[k], smooth)
-            self[k+1] = i[::2,::2]
-            self.expandImpl(self[k+1], i, centerValue)
-            self[k] = i - self[k]
+        # one scratch image for all levels, smaller levels use its upper left corner
+        src = self[srcLevel]
+        scratch = src.__class__(src.shape, dtype=src.dtype, init=False)
+        lo = self._lowestLevel
+        for k in range(srcLevel - lo, destLevel - lo):
+            image, reduced = list.__getitem__(self, k), list.__getitem__(self, k+1)
+            self.reduceImpl(image, reduced, centerValue)
+            i = scratch[tuple(slice(0, s) for s in image.shape)]
+            self.expandImpl(reduced, i, centerValue)
+            numpy.subtract(i, image, out=image)
 
     def expandLaplacian(self, srcLevel, destLevel, centerValue = 0.42):
         '''Expand the image at 'srcLevel' to 'destLevel', using the Burt smoothing filter
@@ -1213,63 +1445,72 @@ class ImagePyramid(list):
            
            For more details, see pyramidExpandBurtLaplacian_ in the C++ documentation.
         '''
-        # FIXME: This should be implemented in C++
         # FIXME: This should be implemented for arbitrary dimensions
-        import filters
-        
         if srcLevel < destLevel:
             raise RuntimeError("ImagePyramid::expandLaplacian(): srcLevel >= destLevel required.")
         if srcLevel < self.lowestLevel or srcLevel > self.highestLevel:
             raise RuntimeError("ImagePyramid::expandLaplacian(): srcLevel does not exist.")
         self.createLevel(destLevel)
 
-        smooth1 = filters.explicitlyKernel(-1, 1, numpy.array([0.5 - centerValue, 2.0*centerValue, 0.5 - centerValue]))
-        smooth2 = filters.explicitlyKernel(-1, 0, numpy.array([0.5, 0.5]));
-        for k in range(srcLevel, destLevel, -1):
-            i = self[k-1].__class__(self[k-1].shape, dtype = self[k-1].dtype)
-            self.expandImpl(self[k], i, centerValue)
-            self[k-1] = i - self[k-1]
+        # one scratch image for all levels, smaller levels use its upper left corner
+        dest = self[destLevel]
+        scratch = dest.__class__(dest.shape, dtype=dest.dtype, init=False)
+        lo = self._lowestLevel
+        for k in range(srcLevel - lo, destLevel - lo, -1):
+            image = list.__getitem__(self, k-1)
+            i = scratch[tuple(slice(0, s) for s in image.shape)]
+            self.expandImpl(list.__getitem__(self, k), i, centerValue)
+            numpy.subtract(i, image, out=image)
 
     def createLevel(self, level):
         ''' Make sure that 'level' exists. If 'level' is outside the current range of levels,
-            empty images of the appropriate shape are inserted into the pyramid.
+            empty images of the appropriate shape are inserted into the pyramid
+            (the images added by one call share a single memory block).
         '''
         if level > self.highestLevel:
+            image = list.__getitem__(self, -1)
+            sd, shape, newShapes = image.spatialDimensions, image.shape, []
             for i in range(self.highestLevel, level):
-                image = list.__getitem__(self, -1)
-                newShape = [int((k + 1) / 2) for k in image.shape]
-                self.append(image.__class__(newShape, dtype=image.dtype))
+                shape = [int((k + 1) / 2) for k in shape[:sd]] + list(shape[sd:])
+                newShapes.append(shape)
+            self.extend(_zeroArraysLike(image, newShapes))
             self._highestLevel = level
         elif level < self.lowestLevel:
             image = list.__getitem__(self, 0)
+            sd, shape, newShapes = image.spatialDimensions, image.shape, []
             for i in range(self.lowestLevel, level, -1):
-                newShape = [2*k-1 for k in image.shape]
-                self.insert(0, image.__class__(newShape, dtype=image.dtype))
+                shape = [2*k-1 for k in shape[:sd]] + list(shape[sd:])
+                newShapes.append(shape)
+            newShapes.reverse()
+            list.__setitem__(self, slice(0, 0), _zeroArraysLike(image, newShapes))
             self._lowestLevel = level
              
 #################################################################
 
+# typecheck functions for registerPythonArrayType(), called by the C++ converters
+# whenever an array is passed to a wrapped function
+def _checkImage(obj):
+    return (type(obj) is numpy.ndarray) or (obj.spatialDimensions == 2)
+
+def _checkVolume(obj):
+    return (type(obj) is numpy.ndarray) or (obj.spatialDimensions == 3)
+
 def _registerArrayTypes():
     from vigranumpycore import registerPythonArrayType
     
-    def checkImage(obj):
-        return (type(obj) is numpy.ndarray) or (obj.spatialDimensions == 2)
-    def checkVolume(obj):
-        return (type(obj) is numpy.ndarray) or (obj.spatialDimensions == 3)
-
-    registerPythonArrayType("NumpyArray<2, Singleband<*> >", ScalarImage, checkImage)
-    registerPythonArrayType("NumpyArray<2, RGBValue<*> >", RGBImage, checkImage)
-    registerPythonArrayType("NumpyArray<2, TinyVector<*, 2> >", Vector2Image, checkImage)
-    registerPythonArrayType("NumpyArray<2, TinyVector<*, 3> >", Vector3Image, checkImage)
-    registerPythonArrayType("NumpyArray<2, TinyVector<*, 4> >", Vector4Image, checkImage)
-    registerPythonArrayType("NumpyArray<3, Multiband<*> >", Image, checkImage)
-    registerPythonArrayType("NumpyArray<3, Singleband<*> >", ScalarVolume, checkVolume)
-    registerPythonArrayType("NumpyArray<3, RGBValue<*> >", RGBVolume, checkVolume)
-    registerPythonArrayType("NumpyArray<3, TinyVector<*, 2> >", Vector2Volume, checkVolume)
-    registerPythonArrayType("NumpyArray<3, TinyVector<*, 3> >", Vector3Volume, checkVolume)
-    registerPythonArrayType("NumpyArray<3, TinyVector<*, 4> >", Vector4Volume, checkVolume)
-    registerPythonArrayType("NumpyArray<3, TinyVector<*, 6> >", Vector6Volume, checkVolume)
-    registerPythonArrayType("NumpyArray<4, Multiband<*> >", Volume, checkVolume)
+    registerPythonArrayType("NumpyArray<2, Singleband<*> >", ScalarImage, _checkImage)
+    registerPythonArrayType("NumpyArray<2, RGBValue<*> >", RGBImage, _checkImage)
+    registerPythonArrayType("NumpyArray<2, TinyVector<*, 2> >", Vector2Image, _checkImage)
+    registerPythonArrayType("NumpyArray<2, TinyVector<*, 3> >", Vector3Image, _checkImage)
+    registerPythonArrayType("NumpyArray<2, TinyVector<*, 4> >", Vector4Image, _checkImage)
+    registerPythonArrayType("NumpyArray<3, Multiband<*> >", Image, _checkImage)
+    registerPythonArrayType("NumpyArray<3, Singleband<*> >", ScalarVolume, _checkVolume)
+    registerPythonArrayType("NumpyArray<3, RGBValue<*> >", RGBVolume, _checkVolume)
+    registerPythonArrayType("NumpyArray<3, TinyVector<*, 2> >", Vector2Volume, _checkVolume)
+    registerPythonArrayType("NumpyArray<3, TinyVector<*, 3> >", Vector3Volume, _checkVolume)
+    registerPythonArrayType("NumpyArray<3, TinyVector<*, 4> >", Vector4Volume, _checkVolume)
+    registerPythonArrayType("NumpyArray<3, TinyVector<*, 6> >", Vector6Volume, _checkVolume)
+    registerPythonArrayType("NumpyArray<4, Multiband<*> >", Volume, _checkVolume)
 
 _registerArrayTypes()
 del _registerArrayTypes
@@ -352,8 +352,8 @@ Some of these functions are also provided as member functions of the vigra array
         __abs__   __add__   __and__   __div__   __divmod__   __eq__   __floordiv__
         __ge__   __gt__   __invert__   __le__   __lshift__   __lt__   __mod__
         __mul__   __ne__   __neg__   __or__   __pos__   __pow__   __radd__
-        __radd__   __rand__   __rdiv__   __rdivmod__   __rfloordiv__   __rlshift__
-        __rmod__   __rmul__   __ror__   __rpow__   __rrshift__   __rshift__
-        __rsub__   __rtruediv__   __rxor__   __sub__   __truediv__   __xor__
+        __rand__   __rdiv__   __rdivmod__   __rfloordiv__   __rlshift__   __rmod__
+        __rmul__   __ror__   __rpow__   __rrshift__   __rshift__   __rsub__
+        __rtruediv__   __rxor__   __sub__   __truediv__   __xor__
 
 '''
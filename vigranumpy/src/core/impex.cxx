@@ -40,6 +40,8 @@
 #include <iostream>
 #include <cstring>
 #include <cstdio>
+#include <cmath>
+#include <algorithm>
 #include "vigra/numpy_array.hxx"
 #include "vigra/impex.hxx"
 #include "vigra/multi_impex.hxx"
@@ -321,6 +323,16 @@ VIGRA_PYTHON_MULTITYPE_FUNCTOR(pywriteVolume, writeVolume)
 #ifdef HasHDF5
 
 namespace detail {
+
+// Release the GIL while HDF5 is busy, so that other Python threads can
+// run in the meantime. This is only safe when the HDF5 library itself was
+// built thread-safe, since another thread may then enter HDF5 as well.
+#ifdef H5_HAVE_THREADSAFE
+typedef PyAllowThreads HDF5AllowThreads;
+#else
+struct HDF5AllowThreads {};
+#endif
+
 template <class T>
 NumpyAnyArray readImageHDF5Impl(HDF5ImportInfo const & info)
 {
@@ -332,7 +344,10 @@ NumpyAnyArray readImageHDF5Impl(HDF5ImportInfo const & info)
       {
         NumpyArray<2, Singleband<T> > res(MultiArrayShape<2>::type(info.shapeOfDimension(0), 
                                                                     info.shapeOfDimension(1)));
-        readHDF5(info, res);
+        {
+            HDF5AllowThreads _pythread;
+            readHDF5(info, res);
+        }
         return res;
       }
       case 3:
@@ -342,7 +357,10 @@ NumpyAnyArray readImageHDF5Impl(HDF5ImportInfo const & info)
         {
             NumpyArray<2, RGBValue<T> > res(MultiArrayShape<2>::type(info.shapeOfDimension(1), 
                                                                       info.shapeOfDimension(2)));
-            readHDF5(info, res);
+            {
+                HDF5AllowThreads _pythread;
+                readHDF5(info, res);
+            }
             return res;
         }
         else
@@ -350,7 +368,10 @@ NumpyAnyArray readImageHDF5Impl(HDF5ImportInfo const & info)
             NumpyArray<3, Multiband<T> > res(MultiArrayShape<3>::type(info.shapeOfDimension(0), 
                                                                        info.shapeOfDimension(1), 
                                                                        info.shapeOfDimension(2)));
-            readHDF5(info, res);
+            {
+                HDF5AllowThreads _pythread;
+                readHDF5(info, res);
+            }
             TinyVector<npy_intp, 3> permutation(1,2,0);
             PyArray_Dims permute = { permutation.begin(), 3 };
             python_ptr array(PyArray_Transpose(res.pyArray(), &permute), python_ptr::keep_count);
@@ -405,22 +426,179 @@ NumpyAnyArray readImageFromHDF5(const char * filePath, const char * pathInFile,
     return NumpyAnyArray();
 }
 
+namespace detail {
+
+// Translate the 'chunks' argument of writeImageToHDF5() and writeVolumeToHDF5()
+// into a chunk shape. A zero shape means contiguous (unchunked) storage.
+// If 'hasChannelAxis' is true, axis 0 is the channel axis of a multiband array,
+// which the default chunk shape keeps whole (so that the channels of a pixel
+// always end up in the same chunk).
+template <unsigned int N>
+typename MultiArrayShape<N>::type
+chunkShapeHDF5(python::object chunks, typename MultiArrayShape<N>::type const & shape, 
+               MultiArrayIndex itemSize, bool hasChannelAxis)
+{
+    typename MultiArrayShape<N>::type res;
+    if(chunks.ptr() == Py_None || chunks.ptr() == Py_False)
+        return res;
+    if(chunks.ptr() == Py_True)
+    {
+        // default: halve the spatial axes, starting with the slowest-varying one,
+        // until a chunk holds at most 1 MB (or cannot be split any further)
+        int first = hasChannelAxis ? 1 : 0;
+        res = max(shape, typename MultiArrayShape<N>::type(1));
+        MultiArrayIndex minSize = hasChannelAxis ? res[0] : 1;
+        for(int k = N-1; prod(res)*itemSize > (1 << 20) && prod(res) > minSize; 
+            k = (k == first) ? N-1 : k-1)
+            res[k] = (res[k] + 1) / 2;
+        return res;
+    }
+    vigra_precondition(python::extract<int>(chunks).check(),
+        "writeToHDF5(): 'chunks' must be True, False, None, or an int.");
+    int size = python::extract<int>(chunks)();
+    if(size > 0)
+        for(unsigned int k=0; k<N; ++k)
+            res[k] = std::max<MultiArrayIndex>(1, std::min<MultiArrayIndex>(size, shape[k]));
+    return res;
+}
+
+// Copy 'src' into 'dest' block by block, such that the source and destination
+// region of each block (about 32 kB) stay in the cache. This avoids the
+// cache-hostile access pattern of an elementwise copy when the memory order
+// of 'src' differs from scan order (e.g. for arrays in numpy order).
+template <unsigned int N, class T>
+void copyBlockwise(MultiArrayView<N, T, StridedArrayTag> const & src, 
+                   MultiArrayView<N, T, UnstridedArrayTag> dest)
+{
+    typedef typename MultiArrayShape<N>::type Shape;
+    
+    int edge = std::max(1, (int)std::pow((32 << 10) / (double)sizeof(T), 1.0 / N));
+    Shape block(edge), start;
+    while(true)
+    {
+        Shape stop = min(start + block, src.shape());
+        dest.subarray(start, stop) = src.subarray(start, stop);
+        unsigned int k = 0;
+        for(; k<N; ++k)
+        {
+            start[k] += block[k];
+            if(start[k] < src.shape(k))
+                break;
+            start[k] = 0;
+        }
+        if(k == N)
+            break;
+    }
+}
+
+template <unsigned int N, class T>
+bool isScanOrder(MultiArrayView<N, T, StridedArrayTag> const & array)
+{
+    for(unsigned int k=1; k<N; ++k)
+        if(array.stride(k-1) > array.stride(k))
+            return false;
+    return true;
+}
+
+// Note: MultiArrayView::isUnstrided() only checks the position of the last
+// element, so it also holds for transposed or permuted dense arrays.
+template <unsigned int N, class T>
+bool isConsecutiveInScanOrder(MultiArrayView<N, T, StridedArrayTag> const & array)
+{
+    MultiArrayIndex stride = 1;
+    for(unsigned int k=0; k<N; ++k)
+    {
+        if(array.shape(k) != 1 && array.stride(k) != stride)
+            return false;
+        stride *= array.shape(k);
+    }
+    return true;
+}
+
+template <unsigned int N, class T>
+void writeToHDF5(const char * filePath, const char * pathInFile, 
+                 MultiArrayView<N, T, StridedArrayTag> const & array,
+                 python::object chunks, int compression, bool hasChannelAxis)
+{
+    vigra_precondition(0 <= compression && compression <= 9,
+        "writeToHDF5(): 'compression' must be between 0 and 9.");
+    typename MultiArrayShape<N>::type chunkShape = 
+        chunkShapeHDF5<N>(chunks, array.shape(), sizeof(T), hasChannelAxis);
+
+    HDF5AllowThreads _pythread;
+    if(chunkShape[0] == 0)
+    {
+        vigra_precondition(compression == 0,
+            "writeToHDF5(): compression requires chunked storage.");
+        writeHDF5(filePath, pathInFile, array);
+        return;
+    }
+    HDF5File file(filePath, HDF5File::Open);
+    // compressed data are byte-shuffled before deflation
+    file.createDataset<N, T>(pathInFile, array.shape(), T(), chunkShape, compression, true);
+    if(isConsecutiveInScanOrder(array))
+    {
+        // the data are already consecutive in scan order => write them without a copy
+        MultiArrayView<N, T, UnstridedArrayTag> view(array.shape(), array.data());
+        file.writeBlock(pathInFile, typename MultiArrayShape<N>::type(), view);
+        return;
+    }
+
+    // Otherwise, stream the data into the dataset in slabs of whole chunks
+    // (about 1 MB each), so that only one slab has to be held in a
+    // consecutive buffer at any time.
+    typedef typename MultiArrayShape<N>::type Shape;
+    Shape slab(chunkShape);
+    for(unsigned int k=0; k<N; ++k)
+        while(prod(slab)*(MultiArrayIndex)sizeof(T) < (1 << 20) && slab[k] < array.shape(k))
+            slab[k] += chunkShape[k];
+    slab = min(slab, array.shape());
+
+    MultiArray<N, T> buffer;
+    Shape start;
+    while(true)
+    {
+        Shape stop = min(start + slab, array.shape());
+        if(buffer.shape() != stop - start)
+            buffer.reshape(stop - start);
+        if(isScanOrder(array))
+            buffer = array.subarray(start, stop);
+        else
+            copyBlockwise(array.subarray(start, stop), buffer);
+        file.writeBlock(pathInFile, start, buffer);
+        unsigned int k = 0;
+        for(; k<N; ++k)
+        {
+            start[k] += slab[k];
+            if(start[k] < array.shape(k))
+                break;
+            start[k] = 0;
+        }
+        if(k == N)
+            break;
+    }
+}
+
+} // namespace detail
+
 template <class T>
 void writeImageToHDF5(NumpyArray<3, Multiband<T> > const & image,
                     const char * filePath, 
                     const char * pathInFile, 
-                    python::object export_type)  
+                    python::object export_type,
+                    python::object chunks,
+                    int compression)  
 {
     // write the data
     // if scalar image
     if(image.shape(2) == 1)
     {
-        writeHDF5(filePath, pathInFile, image.bindOuter(0));
+        detail::writeToHDF5(filePath, pathInFile, image.bindOuter(0), chunks, compression, false);
     }
     else
     {
         MultiArrayShape<3>::type permute(2,0,1);
-        writeHDF5(filePath, pathInFile, image.permuteDimensions(permute));
+        detail::writeToHDF5(filePath, pathInFile, image.permuteDimensions(permute), chunks, compression, true);
     }
 }
 
@@ -439,7 +617,10 @@ NumpyAnyArray readVolumeHDF5Impl(HDF5ImportInfo const & info)
         NumpyArray<3, Singleband<T> > res(MultiArrayShape<3>::type(info.shapeOfDimension(0), 
                                                                     info.shapeOfDimension(1), 
                                                                     info.shapeOfDimension(2)));
-        readHDF5(info, res);
+        {
+            HDF5AllowThreads _pythread;
+            readHDF5(info, res);
+        }
         return res;
       }
       case 4:
@@ -448,7 +629,10 @@ NumpyAnyArray readVolumeHDF5Impl(HDF5ImportInfo const & info)
                                                                    info.shapeOfDimension(1), 
                                                                    info.shapeOfDimension(2), 
                                                                    info.shapeOfDimension(3)));
-        readHDF5(info, res);
+        {
+            HDF5AllowThreads _pythread;
+            readHDF5(info, res);
+        }
         TinyVector<npy_intp, 4> permutation(1,2,3,0);
         PyArray_Dims permute = { permutation.begin(), 4 };
         python_ptr array(PyArray_Transpose(res.pyArray(), &permute), python_ptr::keep_count);
@@ -505,18 +689,20 @@ template <class T>
 void writeVolumeToHDF5(NumpyArray<4, Multiband<T> > const & volume,
                     const char * filePath, 
                     const char * pathInFile, 
-                    python::object export_type) 
+                    python::object export_type,
+                    python::object chunks,
+                    int compression) 
 {
     // write the data
     // if scalar volume
     if(volume.shape(3) == 1)
     {
-        writeHDF5(filePath, pathInFile, volume.bindOuter(0));
+        detail::writeToHDF5(filePath, pathInFile, volume.bindOuter(0), chunks, compression, false);
     }
     else
     {
         MultiArrayShape<4>::type permute(3,0,1,2);
-        writeHDF5(filePath, pathInFile, volume.permuteDimensions(permute));
+        detail::writeToHDF5(filePath, pathInFile, volume.permuteDimensions(permute), chunks, compression, true);
     }
 }
 
@@ -683,10 +869,19 @@ void defineImpexFunctions()
         "If the file contains 4-dimensional data, the innermost (last)\n"
         "index is interpreted as a channel dimension.\n\n");
     multidef("writeImageToHDF5", pywriteImageToHDF5<Int8, UInt64, Int64, UInt16, Int16, UInt32, Int32, double, float, UInt8>(), 
-       (arg("image"), arg("filepath"), arg("pathInFile"), arg("dtype") = ""),
+       (arg("image"), arg("filepath"), arg("pathInFile"), arg("dtype") = "", 
+        arg("chunks") = true, arg("compression") = 0),
         "Save an image to an HDF5 file::\n\n"
-        "   writeImageToHDF5(image, filepath, pathInFile, dtype='')\n\n"
+        "   writeImageToHDF5(image, filepath, pathInFile, dtype='', chunks=True, compression=0)\n\n"
         "Argument 'dtype' is currently ignored.\n"
+        "Argument 'chunks' selects the dataset layout: True chooses chunks of about 1 MB\n"
+        "(halving the slowest-varying spatial axes first, the channels of a pixel are\n"
+        "never split), an int 'n' creates hypercube chunks\n"
+        "of edge length 'n', and False or None store the data contiguously.\n"
+        "Argument 'compression' (0...9) sets the gzip (deflate) level, where 0 means\n"
+        "no compression. Compressed data are byte-shuffled before deflation (HDF5's\n"
+        "built-in 'shuffle' filter). Compression requires chunked storage. Chunked datasets can\n"
+        "be partially read without loading the entire array.\n"
         "The resulting HDF5 dataset should be identical to the one created by\n"
         "the Python module `h5py <http://h5py.alfven.org/>`_ as follows::\n\n"
         "   import vigra, h5py\n"
@@ -698,10 +893,13 @@ void defineImpexFunctions()
         "\n"
         "(note the axes transposition which accounts for the VIGRA indexing convention).\n\n");
     multidef("writeVolumeToHDF5", pywriteVolumeToHDF5<Int8, UInt64, Int64, UInt16, Int16, UInt32, Int32, double, float, UInt8>(), 
-       (arg("volume"), arg("filepath"), arg("pathInFile"), arg("dtype") = ""),
+       (arg("volume"), arg("filepath"), arg("pathInFile"), arg("dtype") = "", 
+        arg("chunks") = true, arg("compression") = 0),
         "Save a volume to an HDF5 file::\n\n"
-        "   writeVolumeToHDF5(volume, filepath, pathInFile, dtype='')\n\n"
+        "   writeVolumeToHDF5(volume, filepath, pathInFile, dtype='', chunks=True, compression=0)\n\n"
         "Argument 'dtype' is currently ignored.\n"
+        "Arguments 'chunks' and 'compression' have the same meaning as in\n"
+        ":func:`writeImageToHDF5`.\n"
         "The resulting HDF5 dataset should be identical to the one created by\n"
         "the Python module `h5py <http://h5py.alfven.org/>`_ as follows::\n\n"
         "   import vigra, h5py\n"
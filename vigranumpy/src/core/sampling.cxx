@@ -439,6 +439,54 @@ NumpyAnyArray resamplingGaussian2D(NumpyArray<3, Multiband<PixelType> > image,
 }
 
 
+template <class PixelType>
+NumpyAnyArray 
+pythonPyramidReduceBurtFilter(NumpyArray<3, Multiband<PixelType> > image, 
+                              double centerValue,
+                              NumpyArray<3, Multiband<PixelType> > res = python::object())
+{
+    vigra_precondition(0.25 <= centerValue && centerValue <= 0.5,
+        "pyramidReduceBurtFilter(): centerValue must be between 0.25 and 0.5.");
+    res.reshapeIfEmpty(MultiArrayShape<3>::type((image.shape(0) + 1) / 2, 
+                                                (image.shape(1) + 1) / 2,
+                                                image.shape(2)),
+        "pyramidReduceBurtFilter(): oldSize = ceil(newSize / 2) required.");
+    {
+        PyAllowThreads _pythread;
+        for(int k=0; k<image.shape(2); ++k)
+        {
+            MultiArrayView<2, PixelType, StridedArrayTag> bimage = image.bindOuter(k);
+            MultiArrayView<2, PixelType, StridedArrayTag> bres = res.bindOuter(k);
+            pyramidReduceBurtFilter(srcImageRange(bimage), destImageRange(bres), centerValue);
+        }
+    }
+    return res;
+}
+
+template <class PixelType>
+NumpyAnyArray 
+pythonPyramidExpandBurtFilter(NumpyArray<3, Multiband<PixelType> > image, 
+                              double centerValue,
+                              NumpyArray<3, Multiband<PixelType> > res)
+{
+    vigra_precondition(0.25 <= centerValue && centerValue <= 0.5,
+        "pyramidExpandBurtFilter(): centerValue must be between 0.25 and 0.5.");
+    vigra_precondition(image.shape(0) == (res.shape(0) + 1) / 2 && 
+                       image.shape(1) == (res.shape(1) + 1) / 2 &&
+                       image.shape(2) == res.shape(2),
+        "pyramidExpandBurtFilter(): oldSize = ceil(newSize / 2) required.");
+    {
+        PyAllowThreads _pythread;
+        for(int k=0; k<image.shape(2); ++k)
+        {
+            MultiArrayView<2, PixelType, StridedArrayTag> bimage = image.bindOuter(k);
+            MultiArrayView<2, PixelType, StridedArrayTag> bres = res.bindOuter(k);
+            pyramidExpandBurtFilter(srcImageRange(bimage), destImageRange(bres), centerValue);
+        }
+    }
+    return res;
+}
+
 /********************************************************************/
 /*                                                                  */
 /*                         SplineImageView                          */
@@ -799,6 +847,22 @@ void defineSampling()
           "This function utilizes resamplingConvolveImage_ with a Gaussianfilter\n"
           "(see the vigra C++ documentation for details).\n\n");
 
+    def("pyramidReduceBurtFilter", registerConverters(&pythonPyramidReduceBurtFilter<float>),
+          (arg("image"), arg("centerValue")=0.42, arg("out")=python::object()),
+          "Two-fold down-sampling of 'image' using the Burt filter with the given\n"
+          "'centerValue' (which must be between 0.25 and 0.5). Only the retained\n"
+          "samples are computed. If 'out' is given, it must have the shape ceil(oldSize / 2).\n"
+          "This function also works for multiband images, it is then executed on every band.\n\n"
+          "For more details, see pyramidReduceBurtFilter_ in the vigra C++ documentation.\n");
+
+    def("pyramidExpandBurtFilter", registerConverters(&pythonPyramidExpandBurtFilter<float>),
+          (arg("image"), arg("centerValue")=0.42, arg("out")),
+          "Two-fold up-sampling of 'image' into 'out' using the Burt filter with the\n"
+          "given 'centerValue' (which must be between 0.25 and 0.5). The shape of 'out'\n"
+          "determines the result size and must fulfill oldSize = ceil(newSize / 2).\n"
+          "This function also works for multiband images, it is then executed on every band.\n\n"
+          "For more details, see pyramidExpandBurtFilter_ in the vigra C++ documentation.\n");
+
     def("resizeImageNoInterpolation",
         registerConverters(&pythonResizeImageNoInterpolation<float>),               // also multiband
         (arg("image"), arg("shape")=object(), arg("out")=object()),
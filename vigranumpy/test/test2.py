@@ -110,6 +110,15 @@ def test_resize():
         image,shape=(image.shape[0],image.shape[1]), order=4)
     checkAboutSame(i2,image)
 
+def test_pyramid():
+    i2=pyramidReduceBurtFilter(image)
+    assert(i2.shape==(50,50,3))
+    i3=at.RGBImage((100,100),dtype=np.float32)
+    pyramidExpandBurtFilter(i2,out=i3)
+    assert(np.abs(i3).max()<=256)
+    i2=pyramidReduceBurtFilter(scalar_image[:99,:99],centerValue=0.5)
+    assert(i2.shape[:2]==(50,50))
+    
 def test_2DMorphology():
     i2=discErosion(image.astype(np.uint8),radius=2)
     i3=(255-discDilation((256-image).astype(np.uint8),radius=2))
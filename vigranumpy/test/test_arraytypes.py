@@ -680,6 +680,125 @@ def testDeepcopyWithCyclicReference():
         assert hasattr(c, "myCustomAttribute")
         assert c.myCustomAttribute.backLink is c
 
+def testDefaultDtype():
+    assert_equal(arraytypes.ScalarImage((3, 2)).dtype, numpy.float32)
+    class DoubleImage(arraytypes.ScalarImage):
+        defaultDtype = numpy.float64
+    assert_equal(DoubleImage((3, 2)).dtype, numpy.float64)
+    assert_equal(DoubleImage((3, 2), numpy.uint8).dtype, numpy.uint8)
+
+def testResize():
+    a = arraytypes.ScalarImage((4, 3), value=1)
+    a.resize((2, 5))
+    assert_equal(a.shape, (2, 5))
+    assert_equal(len(a.axistags), 2)
+    assert (a == 1).all()
+
+def testChannelSlice():
+    a = arraytypes.RGBImage((4,3))
+    b = a[..., 1]
+    assert_equal(1, b.bands())
+    assert_equal(1, b.channels)
+    assert_equal(3, a.channels)
+    assert_equal(3, arraytypes.RGBImage.channels)
+    assert_equal((4,3), b.shape)
+    # a single channel with singleton channel axis is neither 'V' nor dense
+    b = a[..., 1:2]
+    assert_equal(1, b.bands())
+    assert_equal('A', b.order)
+    assert_equal('V', a.order)
+
+def testSplitChannels():
+    a = arraytypes.RGBImage((4,3), numpy.uint8)
+    a[...] = numpy.arange(3)
+    channels = a.splitChannels()
+    assert_equal(3, len(channels))
+    for k in range(3):
+        assert_equal(arraytypes.ScalarImage, type(channels[k]))
+        assert_equal(numpy.uint8, channels[k].dtype)
+        assert_equal((4,3), channels[k].shape)
+        assert channels[k].flags.f_contiguous
+        assert (channels[k] == k).all()
+
+    a = arraytypes.Vector2Volume((4,3,2))
+    channels = a.splitChannels()
+    assert_equal(2, len(channels))
+    assert_equal(arraytypes.ScalarVolume, type(channels[0]))
+    assert_equal((4,3,2), channels[1].shape)
+
+def testToGray():
+    a = arraytypes.RGBImage((4,3), numpy.uint8)
+    a[...] = (100, 200, 50)
+    g = a.toGray()
+    assert_equal(arraytypes.ScalarImage, type(g))
+    assert_equal(numpy.float32, g.dtype)
+    assert_equal((4,3), g.shape)
+    assert g.flags.f_contiguous
+    assert (abs(g - (0.299*100 + 0.587*200 + 0.114*50)) < 1e-3).all()
+    g = a.toGray('Rec709')
+    assert (abs(g - (0.2126*100 + 0.7152*200 + 0.0722*50)) < 1e-3).all()
+    g = a.toGray((1.0, 0.0, 0.0))
+    assert (g == 100).all()
+    for weights in ['foo', 'Rec', (1.0, 0.0)]:
+        try:
+            a.toGray(weights)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("toGray() accepted invalid weights %r" % (weights,))
+
+    a = arraytypes.RGBVolume((4,3,2), numpy.float64, value=1.0)
+    g = a.toGray()
+    assert_equal(arraytypes.ScalarVolume, type(g))
+    assert_equal(numpy.float64, g.dtype)
+    assert_equal((4,3,2), g.shape)
+    assert (abs(g - 1.0) < 1e-10).all()
+
+def testImagePyramid():
+    for dtype in [numpy.float32, numpy.float64]:
+        a = arraytypes.ScalarImage((15,12), dtype, value=2.0)
+        p = arraytypes.ImagePyramid(a, 0, -1, 0)
+        p.expand(0, -1)
+        assert_equal((29,23), p[-1].shape)
+        assert (abs(p[-1] - 2.0) < 1e-5).all()
+
+    a = arraytypes.Image((15,12,2), value=1.0)
+    p = arraytypes.ImagePyramid(a, 0, 0, 0)
+    assert_equal(a.order, p[0].order)
+    assert_equal(repr(a.axistags), repr(p[0].axistags))
+    assert (p[0] == a).all()
+    p[0][...] = 2.0
+    assert (a == 1.0).all()
+    p[0] = a
+    assert (p[0] == 1.0).all()
+    p[0] = 3.0
+    assert (p[0] == 3.0).all()
+
+    p = arraytypes.ImagePyramid(arraytypes.Image((15,12,2)), 0, -2, 2)
+    assert_equal([(57,45,2), (29,23,2), (15,12,2), (8,6,2), (4,3,2)],
+                 [p[k].shape for k in range(-2, 3)])
+
+    a = arraytypes.ScalarImage(numpy.random.random((15,12)))
+    p32 = arraytypes.ImagePyramid(a, 0, -1, 0)
+    p64 = arraytypes.ImagePyramid(arraytypes.ScalarImage(a, dtype=numpy.float64), 0, -1, 0)
+    p32.expand(0, -1)
+    p64.expand(0, -1)
+    # the float32 (C++) and float64 (convolve) paths only agree away from the border
+    assert (abs(p32[-1][2:-2,2:-2] - p64[-1][2:-2,2:-2]) < 1e-5).all()
+
+    p32 = arraytypes.ImagePyramid(a, 0, 0, 2)
+    p64 = arraytypes.ImagePyramid(arraytypes.ScalarImage(a, dtype=numpy.float64), 0, 0, 2)
+    p32.reduce(0, 2)
+    p64.reduce(0, 2)
+    assert_equal((8,6), p32[1].shape)
+    assert_equal((4,3), p32[2].shape)
+    assert (abs(p32[1][2:-2,2:-2] - p64[1][2:-2,2:-2]) < 1e-5).all()
+
+    p = arraytypes.ImagePyramid(a, 0, 0, 2)
+    p.reduceLaplacian(0, 2)
+    p.expandLaplacian(2, 0)
+    assert (abs(p[0] - a) < 1e-4).all()
+
 def testUfuncs():
     from numpy import bool, int8, uint8, int16, uint16, int32, uint32, int64, uint64
     from numpy import float32, float64, longdouble, complex64, complex128, clongdouble
@@ -749,6 +868,12 @@ def testUfuncs():
         b = a1 + 1
         assert (b == 3).all()
         assert_equal(a1.dtype, b.dtype)
+        b = 1 << a1
+        assert (b == 4).all()
+        assert_equal(a1.dtype, b.dtype)
+        b = 8 >> a1
+        assert (b == 2).all()
+        assert_equal(a1.dtype, b.dtype)
         b = a1 + 1.0
         assert (b == 3.0).all()
         if a1.dtype.itemsize < 8:
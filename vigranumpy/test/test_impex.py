@@ -148,3 +148,74 @@ def test_writeAndReadVolumeHDF5():
     h5py_file = h5py.File('hdf5test.hd5', 'r')
     volumeFloat_imp2 = h5py_file['/group/subgroup/voldata']
     checkEqualData(volumeFloat, volumeFloat_imp2.value.swapaxes(0,2))
+
+def test_writeChunkedAndCompressedHDF5():
+    if not hasattr(im, 'writeImageToHDF5'):
+        return
+    
+    for chunks, compression in [(True, 0), (True, 6), (4, 0), (4, 6), (False, 0), (None, 0)]:
+        im.writeImageToHDF5(image, "hdf5test.hd5", "group/chunked", chunks=chunks, compression=compression)
+        checkEqualData(image, im.readImageFromHDF5("hdf5test.hd5", "group/chunked"))
+        im.writeVolumeToHDF5(volumeFloat, "hdf5test.hd5", "group/chunked", chunks=chunks, compression=compression)
+        checkEqualData(volumeFloat, im.readVolumeFromHDF5("hdf5test.hd5", "group/chunked"))
+
+def test_writeShuffledHDF5():
+    if not hasattr(im, 'writeImageToHDF5'):
+        return
+    
+    for compression in [0, 6]:
+        im.writeImageToHDF5(image, "hdf5test.hd5", "group/shuffled", compression=compression)
+        checkEqualData(image, im.readImageFromHDF5("hdf5test.hd5", "group/shuffled"))
+        im.writeImageToHDF5(image[1:,:-1], "hdf5test.hd5", "group/shuffled", compression=compression)
+        checkEqualData(image[1:,:-1], im.readImageFromHDF5("hdf5test.hd5", "group/shuffled"))
+
+        try:
+            import h5py
+        except:
+            continue
+        h5py_file = h5py.File('hdf5test.hd5', 'r')
+        # the shuffle filter is only used together with compression
+        assert_equal(compression > 0, bool(h5py_file['/group/shuffled'].shuffle))
+        h5py_file.close()
+
+def test_defaultChunkShapeHDF5():
+    if not hasattr(im, 'writeImageToHDF5'):
+        return
+    try:
+        import h5py
+    except:
+        return
+    
+    # 4.3 MB of data => 1 MB chunks that keep the channel axis whole
+    rgb = at.RGBImage((600, 600), dtype=np.float32)
+    im.writeImageToHDF5(rgb, "hdf5test.hd5", "group/chunked")
+    h5py_file = h5py.File('hdf5test.hd5', 'r')
+    assert_equal((150, 300, 3), h5py_file['/group/chunked'].chunks)
+    h5py_file.close()
+
+@raises(RuntimeError)
+def test_writeCompressedUnchunkedHDF5():
+    if not hasattr(im, 'writeImageToHDF5'):
+        raise RuntimeError()
+    im.writeImageToHDF5(image, "hdf5test.hd5", "group/chunked", chunks=False, compression=6)
+
+def test_writeCOrderHDF5():
+    if not hasattr(im, 'writeImageToHDF5'):
+        return
+    
+    scalar_c = at.ScalarImage(scalar_image, order='C')
+    image_c = at.RGBImage(image, order='C')
+    volume_c = at.ScalarVolume(np.random.rand(8,9,10)*255, dtype=np.float32, order='C')
+    multiband_c = at.Volume(volumeFloat, order='C')
+    assert(scalar_c.flags.c_contiguous and image_c.flags.c_contiguous)
+    for chunks in [True, 4, False]:
+        im.writeImageToHDF5(scalar_c, "hdf5test.hd5", "group/corder", chunks=chunks)
+        checkEqualData(scalar_c, im.readImageFromHDF5("hdf5test.hd5", "group/corder"))
+        im.writeImageToHDF5(image_c, "hdf5test.hd5", "group/corder", chunks=chunks)
+        checkEqualData(image_c, im.readImageFromHDF5("hdf5test.hd5", "group/corder"))
+        im.writeImageToHDF5(scalar_c.view(np.ndarray), "hdf5test.hd5", "group/corder", chunks=chunks)
+        checkEqualData(scalar_c, im.readImageFromHDF5("hdf5test.hd5", "group/corder"))
+        im.writeVolumeToHDF5(volume_c, "hdf5test.hd5", "group/corder", chunks=chunks)
+        checkEqualData(volume_c, im.readVolumeFromHDF5("hdf5test.hd5", "group/corder"))
+        im.writeVolumeToHDF5(multiband_c, "hdf5test.hd5", "group/corder", chunks=chunks)
+        checkEqualData(multiband_c, im.readVolumeFromHDF5("hdf5test.hd5", "group/corder"))